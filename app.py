@@ -1,8 +1,11 @@
 import streamlit as st
 import yfinance as yf
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+from pathlib import Path
+import time
 import ta
 
 st.set_page_config(page_title="Analisador de Ações", layout="wide")
@@ -347,6 +350,377 @@ def gerar_sinais(df):
     
     return sinais
 
+# ============================================================================
+# FUNÇÕES DE CARTEIRA
+# ============================================================================
+
+def carregar_lista_tickers(arquivo):
+    """Lê uma lista de tickers (um por linha) de um arquivo texto"""
+    with open(arquivo, encoding='utf-8') as f:
+        return [linha.strip() for linha in f if linha.strip()]
+
+def carregar_dados_universo(tickers, periodo, intervalo):
+    """Baixa o histórico OHLCV de vários tickers de uma só vez
+    
+    Os preços são ajustados por dividendos e desdobramentos, como em
+    stock.history() na análise individual.
+    """
+    dados_brutos = yf.download(
+        tickers,
+        period=periodo,
+        interval=intervalo,
+        group_by='ticker',
+        auto_adjust=True,
+        progress=False,
+        threads=True
+    )
+    
+    dados = {}
+    for ticker in tickers:
+        if ticker not in dados_brutos.columns.get_level_values(0):
+            continue
+        df = dados_brutos[ticker].dropna(subset=['Close'])
+        if not df.empty:
+            dados[ticker] = df[['Open', 'High', 'Low', 'Close', 'Volume']].copy()
+    
+    return dados
+
+def selecionar_top_tickers(dados, n_ativos, min_barras=60):
+    """Calcula o score técnico de cada ticker e retorna os n_ativos melhores"""
+    scores = {}
+    for ticker, df in dados.items():
+        if len(df) < min_barras:
+            continue
+        score, _ = calcular_score_compra_venda(calcular_indicadores(df.copy()))
+        scores[ticker] = score
+    
+    # O score anda em passos de 0.5 e empata com frequência; a ordenação estável
+    # sobre os tickers já ordenados desempata pelo ticker, de forma determinística
+    scores = pd.Series(scores, dtype=float).sort_index()
+    return scores.sort_values(ascending=False, kind='stable').head(n_ativos)
+
+def estimar_covariancia_shrinkage(retornos):
+    """Estima a matriz de covariância com shrinkage de Ledoit-Wolf
+    
+    O alvo é a matriz identidade escalada pela variância média. Retorna a
+    matriz encolhida e a intensidade de shrinkage (0 = amostral, 1 = alvo).
+    """
+    X = np.asarray(retornos, dtype=float)
+    n_obs, n_ativos = X.shape
+    X = X - X.mean(axis=0)
+    
+    # Uma única multiplicação de matrizes para a covariância amostral
+    amostral = X.T @ X / n_obs
+    variancia_media = np.trace(amostral) / n_ativos
+    alvo = variancia_media * np.eye(n_ativos)
+    
+    # Distância entre amostral e alvo e variância da estimativa amostral
+    distancia = ((amostral - alvo) ** 2).sum()
+    X2 = X ** 2
+    variancia_estimativa = ((X2.T @ X2) / n_obs - amostral ** 2).sum() / n_obs
+    
+    intensidade = min(variancia_estimativa, distancia) / distancia if distancia > 0 else 1.0
+    covariancia = intensidade * alvo + (1 - intensidade) * amostral
+    
+    return covariancia, intensidade
+
+def _projetar_pesos(v, peso_min, peso_max):
+    """Projeta v em {w : soma(w) = 1, peso_min <= w <= peso_max}"""
+    # A projeção tem a forma clip(v - tau); tau é encontrado por bisseção
+    tau_baixo = v.min() - peso_max
+    tau_alto = v.max() - peso_min
+    for _ in range(60):
+        tau = (tau_baixo + tau_alto) / 2
+        if np.clip(v - tau, peso_min, peso_max).sum() > 1:
+            tau_baixo = tau
+        else:
+            tau_alto = tau
+    return np.clip(v - (tau_baixo + tau_alto) / 2, peso_min, peso_max)
+
+def _resolver_media_variancia(covariancia, retorno_esperado, aversao, peso_min, peso_max,
+                              pesos_iniciais, passo, max_iter=2000, tolerancia=1e-7):
+    """Minimiza 0.5 * w'Σw - aversao * μ'w com gradiente projetado acelerado (FISTA)"""
+    w = _projetar_pesos(pesos_iniciais, peso_min, peso_max)
+    z = w.copy()
+    t = 1.0
+    
+    for iteracao in range(1, max_iter + 1):
+        gradiente = covariancia @ z - aversao * retorno_esperado
+        w_novo = _projetar_pesos(z - passo * gradiente, peso_min, peso_max)
+        if np.abs(w_novo - w).max() < tolerancia:
+            return w_novo, iteracao
+        
+        # Reinicia o momento quando ele aponta contra a descida (restart adaptativo)
+        if (z - w_novo) @ (w_novo - w) > 0:
+            z, t = w_novo, 1.0
+        else:
+            t_novo = (1 + (1 + 4 * t * t) ** 0.5) / 2
+            z = w_novo + ((t - 1) / t_novo) * (w_novo - w)
+            t = t_novo
+        w = w_novo
+    
+    return w, max_iter
+
+def otimizar_carteira(retornos, objetivo="max_sharpe", peso_min=0.0, peso_max=0.2,
+                      taxa_livre_risco=0.10, solucao_anterior=None, n_pontos_fronteira=25):
+    """Calcula pesos de mínima variância ou máximo Sharpe com limites por posição
+    
+    retornos: DataFrame de retornos por período (colunas = tickers).
+    objetivo: "min_variancia" ou "max_sharpe".
+    solucao_anterior: resultado de uma chamada anterior; seus pesos (e os da
+    fronteira) são reindexados por ticker e usados como ponto de partida.
+    """
+    tickers = list(retornos.columns)
+    n_ativos = len(tickers)
+    
+    if n_ativos == 0:
+        raise ValueError("Nenhum ativo disponível para montar a carteira")
+    if n_ativos * peso_min > 1 or n_ativos * peso_max < 1:
+        raise ValueError(
+            f"Limites de posição inviáveis para {n_ativos} ativos "
+            f"(mínimo {peso_min:.0%}, máximo {peso_max:.0%})"
+        )
+    
+    covariancia, intensidade = estimar_covariancia_shrinkage(retornos.values)
+    taxa_diaria = taxa_livre_risco / 252
+    excesso_retorno = retornos.values.mean(axis=0) - taxa_diaria
+    
+    # Passo 1/L, onde L é o maior autovalor da covariância
+    passo = 1.0 / np.linalg.eigvalsh(covariancia)[-1]
+    
+    # Ponto de partida: solução anterior reindexada aos tickers atuais
+    fronteira_anterior = None
+    if solucao_anterior is not None:
+        pesos_iniciais = solucao_anterior['pesos'].reindex(tickers).fillna(0).values
+        # A fronteira só é um bom ponto de partida se o conjunto de ativos for o
+        # mesmo; com ativos novos (peso zero) ela converge mais devagar que do zero
+        fronteira = solucao_anterior.get('fronteira')
+        if (fronteira is not None and len(fronteira) == n_pontos_fronteira
+                and set(fronteira.columns) == set(tickers)):
+            fronteira_anterior = fronteira[tickers].values
+    else:
+        pesos_iniciais = np.full(n_ativos, 1.0 / n_ativos)
+    
+    iteracoes = 0
+    if objetivo == "min_variancia":
+        pesos, iteracoes = _resolver_media_variancia(
+            covariancia, excesso_retorno, 0.0, peso_min, peso_max, pesos_iniciais, passo
+        )
+        fronteira = None
+    elif objetivo == "max_sharpe":
+        # Percorre a fronteira eficiente variando a aversão ao risco; cada ponto
+        # parte da solução do ponto anterior (ou do mesmo ponto na chamada anterior)
+        escala = np.trace(covariancia) / n_ativos / max(np.abs(excesso_retorno).max(), 1e-12)
+        aversoes = np.concatenate([[0.0], escala * np.geomspace(1e-2, 1e2, n_pontos_fronteira - 1)])
+        
+        fronteira = []
+        melhor_sharpe = -np.inf
+        pesos = pesos_iniciais
+        w = pesos_iniciais
+        for i, aversao in enumerate(aversoes):
+            if fronteira_anterior is not None:
+                w = fronteira_anterior[i]
+            w, n_iter = _resolver_media_variancia(
+                covariancia, excesso_retorno, aversao, peso_min, peso_max, w, passo
+            )
+            iteracoes += n_iter
+            fronteira.append(w)
+            
+            volatilidade = (w @ covariancia @ w) ** 0.5
+            sharpe = (w @ excesso_retorno) / volatilidade if volatilidade > 0 else 0
+            if sharpe > melhor_sharpe:
+                melhor_sharpe = sharpe
+                pesos = w
+        fronteira = pd.DataFrame(fronteira, columns=tickers)
+    else:
+        raise ValueError(f"Objetivo desconhecido: {objetivo}")
+    
+    retorno_anual = (pesos @ excesso_retorno + taxa_diaria) * 252 * 100
+    volatilidade_anual = (pesos @ covariancia @ pesos) ** 0.5 * (252 ** 0.5) * 100
+    sharpe_ratio = (retorno_anual / 100 - taxa_livre_risco) / (volatilidade_anual / 100) if volatilidade_anual != 0 else 0
+    
+    return {
+        'pesos': pd.Series(pesos, index=tickers),
+        'retorno_anual': retorno_anual,
+        'volatilidade_anual': volatilidade_anual,
+        'sharpe_ratio': sharpe_ratio,
+        'intensidade_shrinkage': intensidade,
+        'iteracoes': iteracoes,
+        'fronteira': fronteira
+    }
+
+def construir_carteira(dados, n_ativos=10, objetivo="max_sharpe", peso_min=0.0, peso_max=0.2,
+                       solucao_anterior=None, min_observacoes=60, cobertura_minima=0.9):
+    """Seleciona os tickers de maior score e otimiza a alocação entre eles
+    
+    Tickers com histórico menor que cobertura_minima do mais longo são
+    descartados antes do ranking, para que um ativo recém-listado não encurte a
+    amostra de retornos de toda a carteira.
+    """
+    if not dados:
+        raise ValueError("Nenhum dado disponível para montar a carteira")
+    
+    tamanhos = pd.Series({ticker: len(df) for ticker, df in dados.items()}, dtype=int)
+    minimo = max(min_observacoes + 1, int(np.ceil(cobertura_minima * tamanhos.max())))
+    descartados = sorted(tamanhos.index[tamanhos < minimo])
+    elegiveis = {ticker: dados[ticker] for ticker in tamanhos.index[tamanhos >= minimo]}
+    
+    top = selecionar_top_tickers(elegiveis, n_ativos, min_barras=minimo)
+    if top.empty:
+        raise ValueError("Nenhum ticker com histórico suficiente para calcular o score")
+    
+    precos = pd.concat({ticker: dados[ticker]['Close'] for ticker in top.index}, axis=1)
+    retornos = precos.pct_change(fill_method=None).dropna()
+    if len(retornos) < min_observacoes:
+        raise ValueError(
+            f"Apenas {len(retornos)} observações em comum entre os ativos selecionados "
+            f"(mínimo {min_observacoes})"
+        )
+    
+    resultado = otimizar_carteira(
+        retornos,
+        objetivo=objetivo,
+        peso_min=peso_min,
+        peso_max=peso_max,
+        solucao_anterior=solucao_anterior
+    )
+    resultado['scores'] = top
+    resultado['n_observacoes'] = len(retornos)
+    resultado['descartados'] = descartados
+    
+    return resultado
+
+# ============================================================================
+# FUNÇÕES DE REPLAY (SIMULAÇÃO DE FEED AO VIVO)
+# ============================================================================
+
+def salvar_historico(dados, diretorio):
+    """Salva o histórico OHLCV de cada ticker em um CSV no diretório informado"""
+    pasta = Path(diretorio)
+    pasta.mkdir(parents=True, exist_ok=True)
+    for ticker, df in dados.items():
+        df[['Open', 'High', 'Low', 'Close', 'Volume']].to_csv(pasta / f"{ticker}.csv")
+    return len(dados)
+
+def carregar_historico_armazenado(diretorio):
+    """Lê os CSVs de OHLCV salvos no diretório (um arquivo por ticker)"""
+    dados = {}
+    for arquivo in sorted(Path(diretorio).glob("*.csv")):
+        df = pd.read_csv(arquivo, index_col=0)
+        df.index = pd.to_datetime(df.index, utc=True)
+        df = df.sort_index().dropna(subset=['Close'])
+        if not df.empty:
+            dados[arquivo.stem] = df
+    
+    if not dados:
+        raise ValueError(f"Nenhum histórico encontrado em '{diretorio}'")
+    
+    return dados
+
+def gerar_fluxo_replay(dados):
+    """Gera (timestamp, ticker, posição) de todas as barras em ordem cronológica"""
+    tickers = list(dados.keys())
+    timestamps = np.concatenate([dados[t].index.values for t in tickers])
+    indices_ticker = np.concatenate([np.full(len(dados[t]), i) for i, t in enumerate(tickers)])
+    posicoes = np.concatenate([np.arange(len(dados[t])) for t in tickers])
+    
+    # Ordenação estável: empates no timestamp mantêm a ordem dos tickers
+    ordem = np.lexsort((indices_ticker, timestamps))
+    for k in ordem:
+        yield pd.Timestamp(timestamps[k], tz='UTC'), tickers[indices_ticker[k]], posicoes[k]
+
+def executar_replay(dados, velocidade=None, aquecimento=50, max_barras=None,
+                    tempo_maximo=None, ao_progresso=None):
+    """Reproduz o histórico armazenado como um feed ao vivo
+    
+    A cada barra recalcula indicadores, score e sinais do ticker sobre todo o
+    histórico até aquela barra, como a análise individual faz, e mede a
+    latência desse processamento.
+    
+    velocidade: barras por segundo; cada timestamp distinto conta como uma
+    barra de todo o universo, de modo que fins de semana e feriados não geram
+    espera. None reproduz o mais rápido possível.
+    aquecimento: barras mínimas de um ticker antes de começar a analisá-lo.
+    tempo_maximo: segundos de execução após os quais o replay é interrompido.
+    ao_progresso: função opcional chamada como ao_progresso(barras, total), no
+    máximo a cada 0.1 s.
+    """
+    if aquecimento < 14:
+        raise ValueError("O aquecimento precisa de pelo menos 14 barras (janela do ATR)")
+    
+    total = sum(len(df) for df in dados.values())
+    if max_barras is not None:
+        total = min(total, max_barras)
+    
+    latencias = []
+    estado = {}
+    total_sinais = 0
+    barras = 0
+    
+    interrompido = False
+    inicio = time.perf_counter()
+    ultimo_progresso = inicio
+    ultimo_timestamp = None
+    passos = -1
+    
+    for timestamp, ticker, posicao in gerar_fluxo_replay(dados):
+        if barras >= total:
+            break
+        if tempo_maximo and time.perf_counter() - inicio >= tempo_maximo:
+            interrompido = True
+            break
+        
+        # Ritmo: cada novo timestamp é liberado 1/velocidade segundos após o anterior
+        if timestamp != ultimo_timestamp:
+            ultimo_timestamp = timestamp
+            passos += 1
+            if velocidade:
+                espera = inicio + passos / velocidade - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+        
+        barras += 1
+        if posicao + 1 >= aquecimento:
+            t0 = time.perf_counter()
+            
+            df = dados[ticker]
+            df_ate_barra = calcular_indicadores(df.iloc[:posicao + 1].copy())
+            score, _ = calcular_score_compra_venda(df_ate_barra)
+            sinais = gerar_sinais(df_ate_barra)
+            
+            latencias.append(time.perf_counter() - t0)
+            total_sinais += len(sinais)
+            estado[ticker] = {
+                'Ticker': ticker,
+                'Última Barra': timestamp,
+                'Preço': df_ate_barra['Close'].iloc[-1],
+                'RSI': df_ate_barra['RSI'].iloc[-1],
+                'Score': score,
+                'Sinais': len(sinais)
+            }
+        
+        if ao_progresso is not None and time.perf_counter() - ultimo_progresso >= 0.1:
+            ultimo_progresso = time.perf_counter()
+            ao_progresso(barras, total)
+    
+    duracao = time.perf_counter() - inicio
+    latencias_ms = np.array(latencias) * 1000
+    
+    return {
+        'barras_processadas': barras,
+        'barras_analisadas': len(latencias),
+        'interrompido': interrompido,
+        'duracao': duracao,
+        'throughput': barras / duracao if duracao > 0 else 0,
+        'latencia_p50': np.percentile(latencias_ms, 50) if len(latencias_ms) else 0,
+        'latencia_p95': np.percentile(latencias_ms, 95) if len(latencias_ms) else 0,
+        'latencia_p99': np.percentile(latencias_ms, 99) if len(latencias_ms) else 0,
+        'latencia_max': latencias_ms.max() if len(latencias_ms) else 0,
+        'latencias_ms': latencias_ms,
+        'total_sinais': total_sinais,
+        'estado_final': pd.DataFrame(list(estado.values()))
+    }
+
 # ============================================================================
 # FUNÇÕES DE VISUALIZAÇÃO
 # ============================================================================
@@ -574,10 +948,132 @@ def criar_grafico_macd(df):
     
     return fig
 
+def exibir_carteira(resultado):
+    """Exibe a carteira otimizada"""
+    st.header("💼 Carteira Otimizada")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Retorno Anual", f"{resultado['retorno_anual']:.2f}%")
+    with col2:
+        st.metric("Volatilidade", f"{resultado['volatilidade_anual']:.2f}%")
+    with col3:
+        st.metric("Sharpe Ratio", f"{resultado['sharpe_ratio']:.2f}")
+    with col4:
+        st.metric("Shrinkage", f"{resultado['intensidade_shrinkage']:.2f}")
+    
+    pesos = resultado['pesos']
+    df_carteira = pd.DataFrame({
+        'Ticker': pesos.index,
+        'Score': resultado['scores'].reindex(pesos.index).values,
+        'Peso (%)': pesos.values * 100
+    })
+    df_carteira = df_carteira[df_carteira['Peso (%)'] > 0.01].sort_values('Peso (%)', ascending=False)
+    
+    col1, col2 = st.columns([2, 3])
+    
+    with col1:
+        st.dataframe(
+            df_carteira.style.format({'Score': '{:.1f}', 'Peso (%)': '{:.2f}'}),
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    with col2:
+        fig = go.Figure(go.Pie(
+            labels=df_carteira['Ticker'],
+            values=df_carteira['Peso (%)'],
+            hole=0.4
+        ))
+        fig.update_layout(
+            title='Alocação por Ativo',
+            template='plotly_dark',
+            height=400
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    
+    if resultado['descartados']:
+        st.warning(
+            f"⚠️ {len(resultado['descartados'])} ativos descartados por histórico curto: "
+            f"{', '.join(resultado['descartados'])}"
+        )
+    
+    st.caption(
+        f"Otimização sobre {resultado['n_observacoes']} observações em comum, "
+        f"concluída em {resultado['iteracoes']} iterações do gradiente projetado."
+    )
+
+def exibir_resultado_replay(resultado):
+    """Exibe métricas de desempenho e o estado final do replay"""
+    st.header("🔁 Resultado do Replay")
+    
+    if resultado['interrompido']:
+        st.warning("⏹️ Replay interrompido pelo tempo máximo; métricas parciais.")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Barras Processadas", f"{resultado['barras_processadas']:,}")
+    with col2:
+        st.metric("Throughput", f"{resultado['throughput']:,.0f} barras/s")
+    with col3:
+        st.metric("Duração", f"{resultado['duracao']:.2f} s")
+    with col4:
+        st.metric("Sinais Emitidos", f"{resultado['total_sinais']:,}")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Latência p50", f"{resultado['latencia_p50']:.2f} ms")
+    with col2:
+        st.metric("Latência p95", f"{resultado['latencia_p95']:.2f} ms")
+    with col3:
+        st.metric("Latência p99", f"{resultado['latencia_p99']:.2f} ms")
+    with col4:
+        st.metric("Latência Máxima", f"{resultado['latencia_max']:.2f} ms")
+    
+    fig = go.Figure(go.Histogram(
+        x=resultado['latencias_ms'],
+        nbinsx=50,
+        marker_color='purple'
+    ))
+    fig.update_layout(
+        title='Distribuição da Latência por Barra',
+        xaxis_title='Latência (ms)',
+        yaxis_title='Barras',
+        template='plotly_dark',
+        height=300
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    
+    st.subheader("📋 Estado Final por Ticker")
+    if resultado['estado_final'].empty:
+        st.info("ℹ️ Nenhum ticker atingiu o número mínimo de barras para análise.")
+    else:
+        st.dataframe(
+            resultado['estado_final'].sort_values('Score', ascending=False),
+            use_container_width=True,
+            hide_index=True
+        )
+
 # ============================================================================
 # INTERFACE STREAMLIT
 # ============================================================================
 
+UNIVERSOS = {
+    "Ibovespa": "ibov_tickers.txt",
+    "S&P 500": "sp500_tickers.txt"
+}
+
+VELOCIDADES_REPLAY = {
+    "1 barra/s": 1,
+    "5 barras/s": 5,
+    "20 barras/s": 20,
+    "100 barras/s": 100,
+    "Máxima": None
+}
+
 st.title("📈 Analisador Técnico de Ações")
 st.markdown("---")
 
@@ -600,6 +1096,45 @@ with st.sidebar:
     )
     
     analisar = st.button("🔍 Analisar", type="primary", use_container_width=True)
+    
+    st.markdown("---")
+    st.header("💼 Carteira")
+    
+    universo = st.selectbox(
+        "Universo de Ativos",
+        options=list(UNIVERSOS.keys())
+    )
+    
+    n_ativos = st.slider("Número de Ativos", min_value=2, max_value=100, value=10)
+    
+    objetivo = st.selectbox(
+        "Objetivo",
+        options=["max_sharpe", "min_variancia"],
+        format_func=lambda x: "Máximo Sharpe" if x == "max_sharpe" else "Mínima Variância"
+    )
+    
+    peso_max = st.slider("Peso Máximo por Ativo (%)", min_value=5, max_value=100, value=20) / 100
+    
+    montar_carteira = st.button("💼 Montar Carteira", use_container_width=True)
+    
+    st.markdown("---")
+    st.header("🔁 Replay")
+    
+    diretorio_historico = st.text_input("Diretório do Histórico", value="historico")
+    
+    velocidade = st.selectbox(
+        "Velocidade",
+        options=list(VELOCIDADES_REPLAY.keys()),
+        index=len(VELOCIDADES_REPLAY) - 1
+    )
+    
+    max_barras = st.number_input("Máximo de Barras (0 = todas)", min_value=0, value=0, step=1000)
+    
+    tempo_maximo = st.number_input("Tempo Máximo em Segundos (0 = sem limite)", min_value=0, value=60, step=10)
+    
+    salvar = st.button("💾 Salvar Histórico do Universo", use_container_width=True)
+    simular = st.button("▶️ Executar Replay", use_container_width=True)
+    parar = st.button("⏹️ Parar Replay", use_container_width=True)
 
 # Conteúdo principal
 if analisar:
@@ -676,5 +1211,71 @@ if analisar:
     except Exception as e:
         st.error(f"❌ Erro ao processar: {str(e)}")
         st.info("💡 Dica: Verifique se o ticker está correto e tente novamente.")
+elif montar_carteira:
+    try:
+        tickers = carregar_lista_tickers(UNIVERSOS[universo])
+        
+        with st.spinner(f"Carregando dados de {len(tickers)} ativos..."):
+            dados = carregar_dados_universo(tickers, periodo, intervalo)
+        
+        with st.spinner("Otimizando carteira..."):
+            # Reaproveita a solução anterior como ponto de partida quando os
+            # parâmetros não mudaram (ex.: apenas uma nova barra foi incorporada)
+            chave = (universo, n_ativos, objetivo, peso_max, periodo, intervalo)
+            anterior = st.session_state.get('carteira')
+            solucao_anterior = anterior['resultado'] if anterior and anterior['chave'] == chave else None
+            
+            resultado = construir_carteira(
+                dados,
+                n_ativos=n_ativos,
+                objetivo=objetivo,
+                peso_max=peso_max,
+                solucao_anterior=solucao_anterior
+            )
+            st.session_state['carteira'] = {'chave': chave, 'resultado': resultado}
+        
+        exibir_carteira(resultado)
+        
+    except Exception as e:
+        st.error(f"❌ Erro ao montar carteira: {str(e)}")
+        st.info("💡 Dica: Reduza o número de ativos ou aumente o peso máximo por ativo.")
+elif salvar:
+    try:
+        tickers = carregar_lista_tickers(UNIVERSOS[universo])
+        
+        with st.spinner(f"Carregando dados de {len(tickers)} ativos..."):
+            dados = carregar_dados_universo(tickers, periodo, intervalo)
+        
+        n_salvos = salvar_historico(dados, diretorio_historico)
+        st.success(f"✅ Histórico de {n_salvos} ativos salvo em '{diretorio_historico}'")
+        
+    except Exception as e:
+        st.error(f"❌ Erro ao salvar histórico: {str(e)}")
+elif simular:
+    try:
+        dados = carregar_historico_armazenado(diretorio_historico)
+        st.info(f"ℹ️ {len(dados)} ativos carregados de '{diretorio_historico}'")
+        
+        barra_progresso = st.progress(0.0, text="Executando replay...")
+        
+        resultado = executar_replay(
+            dados,
+            velocidade=VELOCIDADES_REPLAY[velocidade],
+            max_barras=max_barras or None,
+            tempo_maximo=tempo_maximo or None,
+            ao_progresso=lambda barras, total: barra_progresso.progress(
+                barras / total, text=f"Executando replay... {barras:,}/{total:,} barras"
+            )
+        )
+        barra_progresso.empty()
+        
+        exibir_resultado_replay(resultado)
+        
+    except Exception as e:
+        st.error(f"❌ Erro ao executar replay: {str(e)}")
+        st.info("💡 Dica: Use 'Salvar Histórico do Universo' para gerar os arquivos do replay.")
+elif parar:
+    # Clicar em um botão durante a execução reinicia o script e interrompe o replay
+    st.warning("⏹️ Replay interrompido.")
 else:
     st.info("👈 Configure os parâmetros na barra lateral e clique em 'Analisar'")